@@ -1,5 +1,8 @@
 import sys
+import math
+import time
 import numpy as np
+from collections import OrderedDict
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QHBoxLayout, QLabel, QPushButton, QTabWidget, 
                             QSizePolicy, QSlider, QDoubleSpinBox, QGroupBox, 
@@ -9,15 +12,30 @@ from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 from matplotlib.patches import Circle
 from matplotlib.lines import Line2D
+from matplotlib.animation import FuncAnimation
 
-class Point:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+def _steiner_kernel(t, R, r, d, out_x, out_y):
+    # Один проход по сетке без временных массивов
+    k = (R - r) / r
+    for i in range(t.shape[0]):
+        ti = t[i]
+        kt = k * ti
+        out_x[i] = (R - r) * math.cos(ti) + d * math.cos(kt)
+        out_y[i] = (R - r) * math.sin(ti) - d * math.sin(kt)
+
+if njit is not None:
+    _steiner_kernel = njit(cache=True, fastmath=True)(_steiner_kernel)
 
 class SteinerCurve:
-    def __init__(self, R=3.0, r=1.0, d=1.0):
+    def __init__(self, R=3.0, r=1.0, d=1.0, n=300):
         self.set_parameters(R, r, d)
+        self._t = np.empty(0)
+        self.set_grid(n)
     
     def set_parameters(self, R, r, d):
         if R <= 0 or r <= 0 or d <= 0:
@@ -29,21 +47,48 @@ class SteinerCurve:
         self.r = r
         self.d = d
     
-    def calculate_cartesian(self, t_values):
-        x = (self.R - self.r) * np.cos(t_values) + self.d * np.cos(((self.R - self.r)/self.r) * t_values)
-        y = (self.R - self.r) * np.sin(t_values) - self.d * np.sin(((self.R - self.r)/self.r) * t_values)
-        return [Point(x[i], y[i]) for i in range(len(t_values))]
-    
-    def calculate_polar(self, t_values):
-        points = self.calculate_cartesian(t_values)
-        r = [np.sqrt(p.x**2 + p.y**2) for p in points]
-        theta = [np.arctan2(p.y, p.x) for p in points]
-        return r, theta
-    
-    def calculate_rolling_circle(self, t_values):
-        x = (self.R - self.r) * np.cos(t_values)
-        y = (self.R - self.r) * np.sin(t_values)
-        return x, y
+    def set_grid(self, n):
+        # cos(t) и sin(t) не зависят от параметров кривой, поэтому
+        # вычисляются один раз при изменении числа шагов
+        if self._t.size == n:
+            return
+        self._t = np.linspace(0, 2*np.pi, n)
+        self._cos_t = np.cos(self._t)
+        self._sin_t = np.sin(self._t)
+        # Буферы результата выделяются только для используемого способа расчёта
+        if njit is not None:
+            self._x = np.empty(n)
+            self._y = np.empty(n)
+        else:
+            self._exp_t = self._cos_t + 1j * self._sin_t
+            self._z = np.empty(n, dtype=complex)
+            self._z_tmp = np.empty(n, dtype=complex)
+    
+    def calculate_cartesian(self):
+        if njit is not None:
+            # Результат пишется в буферы сетки и перезаписывается при следующем вызове
+            _steiner_kernel(self._t, self.R, self.r, self.d, self._x, self._y)
+            return self._x, self._y
+        
+        # x + iy = (R - r)·e^{it} + d·e^{-ikt}: оба слагаемых cos/sin
+        # вычисляются одним проходом комплексной экспоненты.
+        # Все операции пишут в буферы сетки, временные массивы не создаются
+        k = (self.R - self.r) / self.r
+        np.multiply(self._t, -1j * k, out=self._z)
+        np.exp(self._z, out=self._z)
+        np.multiply(self._z, self.d, out=self._z)
+        np.multiply(self._exp_t, self.R - self.r, out=self._z_tmp)
+        np.add(self._z, self._z_tmp, out=self._z)
+        return self._z.real, self._z.imag
+    
+    def calculate_polar(self, x=None, y=None):
+        # Уже рассчитанные декартовы координаты можно передать, чтобы не считать их повторно
+        if x is None or y is None:
+            x, y = self.calculate_cartesian()
+        return np.hypot(x, y), np.arctan2(y, x)
+    
+    def calculate_rolling_circle(self):
+        return (self.R - self.r) * self._cos_t, (self.R - self.r) * self._sin_t
 
 class GraphCanvas(FigureCanvas):
     def __init__(self, parent=None, width=5, height=4, dpi=100):
@@ -51,11 +96,34 @@ class GraphCanvas(FigureCanvas):
         super().__init__(self.figure)
         self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         self.ax = None
+        self._is_polar = False
+        self._painted = True
+        self._dirty = False
         self.artists = []
         self.figure.set_facecolor('none')
     
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        self._painted = True
+        if self._dirty:
+            # Во время ожидания пришёл новый запрос: отрисовываем его сейчас
+            self._dirty = False
+            self.request_draw()
+    
+    def request_draw(self):
+        # Пока предыдущий кадр не выведен на экран, новый запрос не ставится
+        # в очередь, а только запоминается и выполняется из paintEvent,
+        # поэтому лишние перерисовки не копятся за медленным рендером,
+        # а последнее состояние объектов всё равно попадает на экран
+        if self._painted:
+            self._painted = False
+            self.draw_idle()
+        else:
+            self._dirty = True
+    
     def setup_axes(self, polar=False):
         self.clear()
+        self._is_polar = polar
         if polar:
             self.ax = self.figure.add_subplot(111, projection='polar')
         else:
@@ -63,15 +131,9 @@ class GraphCanvas(FigureCanvas):
             self.ax.set_aspect('equal', 'box')
         self.ax.grid(True)
     
-    def draw_curve(self, points, color='b', label=None, polar=False):
-        if polar:
-            theta = [np.arctan2(p.y, p.x) for p in points]
-            r = [np.sqrt(p.x**2 + p.y**2) for p in points]
-            artist, = self.ax.plot(theta, r, color=color, linewidth=2, label=label)
-        else:
-            x = [p.x for p in points]
-            y = [p.y for p in points]
-            artist, = self.ax.plot(x, y, color=color, linewidth=2, label=label)
+    def draw_curve(self, x, y, color='b', label=None, polar=False):
+        # В полярном режиме x, y — это массивы theta, r
+        artist, = self.ax.plot(x, y, color=color, linewidth=2, label=label)
         self.artists.append(artist)
         return artist
     
@@ -105,7 +167,7 @@ class GraphCanvas(FigureCanvas):
         if hasattr(self, 'ax') and self.ax:
             self.ax.clear()
             self.ax.grid(True)
-            if not hasattr(self.ax, 'projection'):
+            if not self._is_polar:
                 self.ax.set_aspect('equal', 'box')
     
     def set_title(self, title):
@@ -113,12 +175,12 @@ class GraphCanvas(FigureCanvas):
             self.ax.set_title(title)
     
     def set_labels(self, xlabel, ylabel):
-        if hasattr(self, 'ax') and self.ax and not hasattr(self.ax, 'projection'):
+        if hasattr(self, 'ax') and self.ax and not self._is_polar:
             self.ax.set_xlabel(xlabel)
             self.ax.set_ylabel(ylabel)
     
     def set_limits(self, limit):
-        if hasattr(self, 'ax') and self.ax and not hasattr(self.ax, 'projection'):
+        if hasattr(self, 'ax') and self.ax and not self._is_polar:
             self.ax.set_xlim(-limit, limit)
             self.ax.set_ylim(-limit, limit)
     
@@ -134,72 +196,191 @@ class Animator:
         self.slider = slider
         self.current_step = 0
         self.total_steps = 300
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_frame)
-        self.timer.setInterval(10)
+        self.interval = 33  # мс между кадрами, ~30 кадров в секунду
+        self.speed = 100  # шагов анимации в секунду
+        self._t_last = 0.0
         self.animation_running = False
-        self.points = []
-        self.polar_r = []
-        self.polar_theta = []
-        self.rolling_circle_x = []
-        self.rolling_circle_y = []
+        self._anim_cart = None
+        self._anim_polar = None
+        self._anim_id = 0
+        self._timer_active = {}
+        self.points_x = np.empty(0)
+        self.points_y = np.empty(0)
+        self.polar_r = np.empty(0)
+        self.polar_theta = np.empty(0)
+        self.rolling_circle_x = np.empty(0)
+        self.rolling_circle_y = np.empty(0)
+        self.max_dim = 0.0
+        # Последние рассчитанные кривые по ключу (R, r, d, total_steps)
+        self._cache = OrderedDict()
+        self.cache_size = 8
         self.current_artists = []
+        self.ax_cart = None
+        self.ax_polar = None
+    
+    def has_points(self):
+        return self.points_x.size > 0
     
     def start_animation(self):
-        if not self.points:
+        if not self.has_points():
             if not self.generate_points():
                 return False
+            self.build_static()
+        if self.ax_cart is None:
+            self.build_static()
         
         if not self.animation_running:
             self.animation_running = True
-            self.timer.start()
+            self._anim_id += 1
+            anim_id = self._anim_id
+            
+            # Сохранение фона, восстановление его в каждом кадре и сброс
+            # при изменении размеров выполняет FuncAnimation (blit=True)
+            self._anim_cart = FuncAnimation(self.cart_canvas.figure, self._update_cart,
+                                            frames=lambda: self._frames(anim_id, self.cart_canvas),
+                                            init_func=self._init_cart,
+                                            interval=self.interval, repeat=False,
+                                            blit=True, cache_frame_data=False)
+            self._anim_polar = FuncAnimation(self.polar_canvas.figure, self._update_polar,
+                                             frames=lambda: self._frames(anim_id, self.polar_canvas),
+                                             init_func=self._init_polar,
+                                             interval=self.interval, repeat=False,
+                                             blit=True, cache_frame_data=False)
+            
+            # Анимация запускается по первому draw_event своего графика
+            self.cart_canvas.draw()
+            self.polar_canvas.draw()
+            self._timer_active = {self.cart_canvas: True, self.polar_canvas: True}
+            self._t_last = time.monotonic()
+            self._sync_animations()
             return True
         return False
     
     def stop_animation(self):
         if self.animation_running:
             self.animation_running = False
-            self.timer.stop()
+            # Анимации завершаются на следующем тике, когда _frames закончится.
+            # Таймер скрытой вкладки остановлен, поэтому он запускается,
+            # чтобы обе анимации дошли до завершения. Ссылки на объекты
+            # FuncAnimation сохраняются, пока они не завершатся
+            for canvas, anim in ((self.cart_canvas, self._anim_cart),
+                                 (self.polar_canvas, self._anim_polar)):
+                if not self._timer_active.get(canvas) and anim.event_source is not None:
+                    anim.event_source.start()
+            self._timer_active = {}
             return True
         return False
     
     def generate_points(self):
         try:
-            t_values = np.linspace(0, 2*np.pi, self.total_steps)
-            self.points = self.curve.calculate_cartesian(t_values)
-            self.polar_r, self.polar_theta = self.curve.calculate_polar(t_values)
-            self.rolling_circle_x, self.rolling_circle_y = self.curve.calculate_rolling_circle(t_values)
+            key = (round(self.curve.R, 4), round(self.curve.r, 4),
+                   round(self.curve.d, 4), self.total_steps)
+            result = self._cache.get(key)
+            if result is None:
+                result = self._compute_points()
+                self._cache[key] = result
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            else:
+                self._cache.move_to_end(key)
+            
+            (self.points_x, self.points_y, self.polar_r, self.polar_theta,
+             self.rolling_circle_x, self.rolling_circle_y, self.max_dim) = result
             return True
         except Exception as e:
             QMessageBox.critical(None, "Ошибка", f"Не удалось рассчитать точки кривой: {str(e)}")
             return False
     
+    def _compute_points(self):
+        self.curve.set_grid(self.total_steps)
+        # calculate_cartesian возвращает буферы кривой, которые перезаписываются
+        # при следующем расчёте, поэтому для кэша нужны копии
+        x, y = self.curve.calculate_cartesian()
+        x, y = x.copy(), y.copy()
+        polar_r, polar_theta = self.curve.calculate_polar(x, y)
+        rolling_x, rolling_y = self.curve.calculate_rolling_circle()
+        max_dim = max(self.curve.R + self.curve.r + self.curve.d,
+                      float(np.abs(x).max()),
+                      float(np.abs(y).max()))
+        return x, y, polar_r, polar_theta, rolling_x, rolling_y, max_dim
+    
+    def _frames(self, anim_id, canvas):
+        # Шаг продвигает любая из работающих анимаций, см. update_frame
+        while self.animation_running and anim_id == self._anim_id:
+            self.update_frame()
+            yield self.current_step
+        
+        # Кадры закончились: при repeat=False FuncAnimation на этом же тике
+        # вызывает pause() (снимает флаг animated), отключает свои обработчики
+        # и освобождает таймер. Отложенная перерисовка выполнится уже после
+        # этого и покажет последний кадр на неподвижном графике
+        if not self.animation_running and self.ax_cart is not None and canvas.isVisible():
+            canvas.request_draw()
+    
+    def _sync_animations(self):
+        # Видна только одна вкладка: анимация скрытого графика приостанавливается.
+        # start() перезапускает уже идущий таймер и сдвигает его срабатывание,
+        # поэтому запускаются только остановленные таймеры
+        for canvas, anim in ((self.cart_canvas, self._anim_cart),
+                             (self.polar_canvas, self._anim_polar)):
+            if anim is None or anim.event_source is None:
+                continue
+            visible = canvas.isVisible()
+            if visible == self._timer_active.get(canvas):
+                continue
+            if visible:
+                anim.event_source.start()
+            else:
+                anim.event_source.stop()
+            self._timer_active[canvas] = visible
+    
+    def on_tab_changed(self):
+        if self.animation_running:
+            self._sync_animations()
+        elif self.ax_cart is not None:
+            # Перерисовывается только уже построенный график: после очистки
+            # переключение вкладок не должно строить его заново
+            self.draw_current_frame()
+    
     def update_frame(self):
         if not self.animation_running:
             return
             
-        self.current_step = (self.current_step + 1) % self.total_steps
+        # Шаг зависит от прошедшего времени, а не от числа срабатываний таймера:
+        # если отрисовка не успевает, кадры пропускаются, а скорость сохраняется
+        # Если обе анимации срабатывают подряд, вторая не сдвигает шаг повторно
+        steps = round((time.monotonic() - self._t_last) * self.speed)
+        if steps < 1:
+            return
+        self._t_last += steps / self.speed
+        self.current_step = (self.current_step + steps) % self.total_steps
+        
+        # Сигнал слайдера блокируется, чтобы кадр не отрисовывался дважды
+        self.slider.blockSignals(True)
         self.slider.setValue(self.current_step)
-        self.draw_current_frame()
+        self.slider.blockSignals(False)
     
     def set_frame(self, step):
         self.current_step = step % self.total_steps
+        # Отсчёт времени анимации продолжается от выбранного вручную шага
+        self._t_last = time.monotonic()
         self.draw_current_frame()
     
-    def draw_current_frame(self):
-        if not self.points or self.current_step >= len(self.points):
+    def build_static(self):
+        # Неизменяемая часть графиков строится один раз, подвижные объекты кэшируются
+        if not self.has_points():
             return
-
-        point = self.points[self.current_step]
         
-        # Полностью пересоздаём декартов график
+        step = self.current_step
+        params = f'R={self.curve.R:.1f}, r={self.curve.r:.1f}, d={self.curve.d:.1f}'
+        
+        # Декартов график
         self.cart_canvas.figure.clear()
         ax_cart = self.cart_canvas.figure.add_subplot(111)
         ax_cart.set_aspect('equal', 'box')
         ax_cart.grid(True)
         
-        # Отрисовываем всё заново
-        ax_cart.plot([p.x for p in self.points], [p.y for p in self.points], 
+        ax_cart.plot(self.points_x, self.points_y, 
                     'b', linewidth=2, label='Кривая Штейнера')
         
         # Неподвижная окружность
@@ -209,48 +390,92 @@ class Animator:
         ax_cart.add_patch(circle_fixed)
         
         # Катящаяся окружность
-        circle_rolling = Circle((self.rolling_circle_x[self.current_step], 
-                               self.rolling_circle_y[self.current_step]),
+        self._rolling = Circle((self.rolling_circle_x[step], 
+                               self.rolling_circle_y[step]),
                                self.curve.r, fill=False, 
                                color='g', linestyle=':',
                                label=f'Катящаяся окружность (r={self.curve.r:.1f})')
-        ax_cart.add_patch(circle_rolling)
+        ax_cart.add_patch(self._rolling)
         
         # Текущая точка
-        ax_cart.plot(point.x, point.y, 'ro', markersize=8, 
-                    label=f'Текущая точка (d={self.curve.d:.1f})')
+        self._moving_pt, = ax_cart.plot([self.points_x[step]], [self.points_y[step]],
+                                        'ro', markersize=8,
+                                        label=f'Текущая точка (d={self.curve.d:.1f})')
         
         # Линия от центра катящейся окружности до точки
-        ax_cart.plot([self.rolling_circle_x[self.current_step], point.x],
-                    [self.rolling_circle_y[self.current_step], point.y],
-                    'g-', linewidth=1)
+        self._radial, = ax_cart.plot([self.rolling_circle_x[step], self.points_x[step]],
+                                     [self.rolling_circle_y[step], self.points_y[step]],
+                                     'g-', linewidth=1)
         
-        ax_cart.set_title(f'Кривая Штейнера\nR={self.curve.R:.1f}, r={self.curve.r:.1f}, d={self.curve.d:.1f}')
+        ax_cart.set_title(f'Кривая Штейнера\n{params}')
         ax_cart.set_xlabel('X')
         ax_cart.set_ylabel('Y')
-        max_dim = max(self.curve.R + self.curve.r + self.curve.d, 
-                     max(abs(p.x) for p in self.points), 
-                     max(abs(p.y) for p in self.points))
-        ax_cart.set_xlim(-max_dim * 1.2, max_dim * 1.2)
-        ax_cart.set_ylim(-max_dim * 1.2, max_dim * 1.2)
+        ax_cart.set_xlim(-self.max_dim * 1.2, self.max_dim * 1.2)
+        ax_cart.set_ylim(-self.max_dim * 1.2, self.max_dim * 1.2)
         ax_cart.legend()
-
-        # Полностью пересоздаём полярный график
+        
+        # Полярный график
         self.polar_canvas.figure.clear()
         ax_polar = self.polar_canvas.figure.add_subplot(111, projection='polar')
         ax_polar.grid(True)
         
-        # Отрисовываем полярный график
-        theta = [np.arctan2(p.y, p.x) for p in self.points]
-        r = [np.sqrt(p.x**2 + p.y**2) for p in self.points]
-        ax_polar.plot(theta, r, 'b', linewidth=2, label='Кривая Штейнера')
-        ax_polar.plot(self.polar_theta[self.current_step], 
-                     self.polar_r[self.current_step], 
-                     'ro', markersize=8, label='Текущая точка')
-        ax_polar.set_title(f'Полярные координаты\nR={self.curve.R:.1f}, r={self.curve.r:.1f}, d={self.curve.d:.1f}')
+        ax_polar.plot(self.polar_theta, self.polar_r, 'b', linewidth=2, label='Кривая Штейнера')
+        self._polar_pt, = ax_polar.plot([self.polar_theta[step]], [self.polar_r[step]], 
+                                        'ro', markersize=8, label='Текущая точка')
+        ax_polar.set_title(f'Полярные координаты\n{params}')
         ax_polar.legend()
-
-        # Обновляем отображение
+        
+        self.ax_cart = ax_cart
+        self.ax_polar = ax_polar
+        
+        self.cart_canvas.draw()
+        self.polar_canvas.draw()
+    
+    def _update_cart(self, step):
+        point_x = self.points_x[step]
+        point_y = self.points_y[step]
+        rolling_x = self.rolling_circle_x[step]
+        rolling_y = self.rolling_circle_y[step]
+        
+        self._rolling.center = (rolling_x, rolling_y)
+        self._moving_pt.set_data([point_x], [point_y])
+        self._radial.set_data([rolling_x, point_x], [rolling_y, point_y])
+        return self._rolling, self._radial, self._moving_pt
+    
+    def _update_polar(self, step):
+        self._polar_pt.set_data([self.polar_theta[step]], [self.polar_r[step]])
+        return (self._polar_pt,)
+    
+    def _init_cart(self):
+        return self._update_cart(self.current_step)
+    
+    def _init_polar(self):
+        return self._update_polar(self.current_step)
+    
+    def draw_current_frame(self):
+        if not self.has_points() or self.current_step >= self.points_x.size:
+            return
+        if self.ax_cart is None:
+            self.build_static()
+        if self.animation_running:
+            # Во время анимации кадр отрисует FuncAnimation
+            return
+        
+        # Обновляем только подвижные объекты; скрытая вкладка
+        # перерисуется при переключении на неё. Частые запросы (например,
+        # при перетаскивании слайдера) объединяются в одну перерисовку
+        self._update_cart(self.current_step)
+        self._update_polar(self.current_step)
+        if self.cart_canvas.isVisible():
+            self.cart_canvas.request_draw()
+        if self.polar_canvas.isVisible():
+            self.polar_canvas.request_draw()
+    
+    def clear(self):
+        self.ax_cart = None
+        self.ax_polar = None
+        self.cart_canvas.figure.clear()
+        self.polar_canvas.figure.clear()
         self.cart_canvas.draw()
         self.polar_canvas.draw()
 
@@ -272,6 +497,12 @@ class MainWindow(QMainWindow):
         # Передаем слайдер в аниматор
         self.animator = Animator(self.steiner_curve, self.cartesian_canvas, self.polar_canvas, self.slider)
         
+        # Таймер для объединения частых изменений параметров в одно обновление
+        self._recompute_timer = QTimer(self)
+        self._recompute_timer.setSingleShot(True)
+        self._recompute_timer.setInterval(50)
+        self._recompute_timer.timeout.connect(self._do_update_parameters)
+        
         self.init_ui()
     
     def init_ui(self):
@@ -341,11 +572,16 @@ class MainWindow(QMainWindow):
         self.tab_widget = QTabWidget()
         self.tab_widget.addTab(self.cartesian_canvas, "Декартова система")
         self.tab_widget.addTab(self.polar_canvas, "Полярная система")
+        self.tab_widget.currentChanged.connect(lambda _: self.animator.on_tab_changed())
         
         main_layout.addWidget(control_panel)
         main_layout.addWidget(self.tab_widget)
     
     def update_parameters(self):
+        self._recompute_timer.start()
+    
+    def _do_update_parameters(self):
+        self._recompute_timer.stop()
         try:
             R = self.R_spin.value()
             r = self.r_spin.value()
@@ -366,15 +602,21 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Ошибка", str(e))
     
     def plot_curve(self):
-        self.update_parameters()
+        self._do_update_parameters()
         
         if self.animator.generate_points():
             self.animator.current_step = 0
+            self.animator.build_static()
             self.slider.setValue(0)
             self.animator.draw_current_frame()
     
     def toggle_animation(self):
-        if not self.animator.points:
+        # Отложенное обновление параметров выполняется сразу, иначе оно
+        # сработает после старта и остановит только что запущенную анимацию
+        if self._recompute_timer.isActive():
+            self._do_update_parameters()
+        
+        if not self.animator.has_points():
             if not self.animator.generate_points():
                 return
             
@@ -394,10 +636,7 @@ class MainWindow(QMainWindow):
         self.slider.setValue(0)
         
         # Полностью очищаем графики
-        self.cartesian_canvas.figure.clear()
-        self.polar_canvas.figure.clear()
-        self.cartesian_canvas.draw()
-        self.polar_canvas.draw()
+        self.animator.clear()
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)